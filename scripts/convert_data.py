@@ -1,21 +1,34 @@
 """Convert data to target camera model."""
 import argparse
+import concurrent.futures
 import cv2
+import hashlib
+import json
 import numpy as np
+import os
 import pprint
 import shutil
 import subprocess
-import tempfile
 import tomli
 import typing as T
 
 from pathlib import Path
 
-from fisheye_model import unproject_fisheye
+from fisheye_model import unproject_fisheye_lut
 from utils import create_grid
 
+try:
+    from fisheye_numba import unproject_fisheye_numba
+except ImportError:
+    # Numba is optional; fall back to the numpy implementation.
+    unproject_fisheye_numba = None
+
 SCRIPT_PATH = Path(__file__).parent.resolve()
 
+# Bump whenever the on-disk table format or the generation code changes, to
+# invalidate previously cached tables.
+TABLE_CACHE_VERSION = 1
+
 
 def get_image_dimensions(camera: T.Dict[str, T.Any]) -> T.Tuple[int, int]:
     match camera.get("dimensions", dict()):
@@ -37,64 +50,157 @@ def get_camera_matrix(camera: T.Dict[str, T.Any]) -> np.ndarray:
             )
 
 
-def create_fisheye_remap_table(camera: T.Dict[str, T.Any]) -> np.ndarray:
-    """Create remap table for the kannala-brant fisheye model."""
+# Number of rows unprojected per tile; 256 rows of float32 output keeps each tile's
+# working set around the size of a typical L2 cache even at 4K widths.
+REMAP_TABLE_TILE_ROWS = 256
+
+
+def create_fisheye_remap_table(
+    camera: T.Dict[str, T.Any], out: T.Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Create remap table for the kannala-brant fisheye model.
+
+    If `out` is provided (e.g. a memmap of the destination file), the table is
+    written directly into it.
+    """
     width, height = get_image_dimensions(camera)
-    K = get_camera_matrix(camera)
+
+    # The downstream shader consumes float32, so compute the whole table in float32 -
+    # precision lost in the inversion is below the output quantization.
+    K = get_camera_matrix(camera).astype(np.float32)
 
     match camera.get("distortion_coefficients", dict()):
         case {"k1": k1, "k2": k2, "k3": k3, "k4": k4}:
-            coeffs = np.array([k1, k2, k3, k4])
+            coeffs = np.array([k1, k2, k3, k4], dtype=np.float32)
         case _:
             raise ValueError(
                 f"Incorrect specification of distortion parameters: {pprint.pformat(camera)}"
             )
 
-    # construct table
-    p_native = create_grid(width=width, height=height)
-    return unproject_fisheye(p_native, K=K, coeffs=coeffs).reshape([height, width, 3])
+    if out is None:
+        out = np.empty([height, width, 3], dtype=np.float32)
+    assert out.shape == (height, width, 3), f"out has wrong shape: {out.shape}"
+
+    # Construct the table in row tiles, so that each tile's inputs and outputs stay
+    # cache-resident instead of streaming the full image through on every pass:
+    p_native = create_grid(width=width, height=height, dtype=np.float32)
+    unproject = (
+        unproject_fisheye_numba
+        if unproject_fisheye_numba is not None
+        else unproject_fisheye_lut
+    )
+    for y0 in range(0, height, REMAP_TABLE_TILE_ROWS):
+        y1 = min(y0 + REMAP_TABLE_TILE_ROWS, height)
+        tile = unproject(p_native[y0 * width : y1 * width], K=K, coeffs=coeffs)
+        out[y0:y1] = tile.reshape([y1 - y0, width, 3])
+    return out
 
 
-def create_brown_conrady_remap_table(camera: T.Dict[str, T.Any]) -> np.ndarray:
-    """Create remap table for the OpenCV/brown-conrady model."""
+def create_brown_conrady_remap_table(
+    camera: T.Dict[str, T.Any], out: T.Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Create remap table for the OpenCV/brown-conrady model.
+
+    If `out` is provided (e.g. a memmap of the destination file), the table is
+    written directly into it.
+    """
     width, height = get_image_dimensions(camera)
-    K = get_camera_matrix(camera)
+    K = get_camera_matrix(camera).astype(np.float32)
 
     match camera.get("distortion_coefficients", dict()):
         case {"k1": k1, "k2": k2, "k3": k3, "p1": p1, "p2": p2}:
-            coeffs = np.array([k1, k2, p1, p2, k3], dtype=np.float64)
+            coeffs = np.array([k1, k2, p1, p2, k3], dtype=np.float32)
         case _:
             raise ValueError(
                 f"Incorrect specification of distortion parameters: {pprint.pformat(camera)}"
             )
 
-    p_native = create_grid(width=width, height=height)
-    p_undistorted = cv2.undistortPoints(
-        p_native.astype(np.float64), K.astype(np.float64), coeffs
-    )
-    p_undistorted = np.squeeze(p_undistorted, axis=1)
-    p_undistorted_unit_depth = np.concatenate(
-        [p_undistorted, np.ones_like(p_undistorted[:, 1:])], axis=1
-    )
-    v_cam = p_undistorted_unit_depth / np.linalg.norm(
-        p_undistorted_unit_depth, axis=1, keepdims=True
-    )
-    return v_cam.reshape([height, width, 3])
+    p_native = create_grid(width=width, height=height, dtype=np.float32)
+    p_undistorted = cv2.undistortPoints(p_native.reshape([-1, 1, 2]), K, coeffs)
+    x = p_undistorted[:, 0, 0]
+    y = p_undistorted[:, 0, 1]
+
+    if out is None:
+        out = np.empty([height, width, 3], dtype=np.float32)
+    assert out.shape == (height, width, 3), f"out has wrong shape: {out.shape}"
+
+    # Normalize [x, y, 1] directly into the output buffer, rather than appending a
+    # homogeneous column and dividing the whole array by its row norms:
+    inv_norm = 1.0 / np.sqrt(x * x + y * y + 1.0)
+    v_cam = out.reshape([-1, 3])
+    v_cam[:, 0] = x * inv_norm
+    v_cam[:, 1] = y * inv_norm
+    v_cam[:, 2] = inv_norm
+    return out
+
+
+def get_intrinsics_key(camera: T.Dict[str, T.Any]) -> T.Tuple:
+    """Hashable key of the fields that determine the remap table contents."""
+    width, height = get_image_dimensions(camera)
+    K = get_camera_matrix(camera)
+    coeffs = tuple(sorted(camera.get("distortion_coefficients", dict()).items()))
+    return (camera.get("model"), width, height, tuple(K.flatten()), coeffs)
 
 
-def create_remap_table(camera: T.Dict[str, T.Any]) -> np.ndarray:
-    """Create remap table for the provided camera."""
+def get_cache_key(camera: T.Dict[str, T.Any]) -> str:
+    """Content hash of a camera description, used to name persistently cached tables."""
+    payload = json.dumps(camera, sort_keys=True) + f"|v{TABLE_CACHE_VERSION}"
+    return hashlib.blake2b(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Cache of remap tables, keyed by `get_intrinsics_key`. Stereo rigs often share
+# intrinsics between cameras, in which case the expensive unproject step need only
+# run once.
+REMAP_TABLE_CACHE: T.Dict[T.Tuple, np.ndarray] = dict()
+
+
+def create_remap_table(
+    camera: T.Dict[str, T.Any], out: T.Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Create remap table for the provided camera, writing into `out` if provided."""
     if "model" not in camera:
         raise KeyError(f"Camera lacks a model specifier: {pprint.pformat(camera)}")
 
+    key = get_intrinsics_key(camera)
+    if key in REMAP_TABLE_CACHE:
+        table = REMAP_TABLE_CACHE[key]
+        if out is not None:
+            np.copyto(out, table, casting="same_kind")
+            return out
+        return table
+
     model = camera["model"]
     if model == "fisheye":
-        return create_fisheye_remap_table(camera)
+        table = create_fisheye_remap_table(camera, out=out)
     elif model == "brown-conrady":
-        return create_brown_conrady_remap_table(camera)
+        table = create_brown_conrady_remap_table(camera, out=out)
     else:
         raise KeyError(f"Invalid camera model: {model}")
 
+    REMAP_TABLE_CACHE[key] = table
+    return table
+
+
+def write_remap_table(camera: T.Dict[str, T.Any], path: Path) -> None:
+    """Generate the remap table for `camera` directly into a float32 raw file."""
+    width, height = get_image_dimensions(camera)
+
+    # Generate into a temporary name and rename into place only once complete, so an
+    # interrupted or failed run cannot leave a garbage file at the cached path (the
+    # memmap creates the file at full size before any data is computed):
+    temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    try:
+        out = np.memmap(
+            temp_path, dtype=np.float32, mode="w+", shape=(height, width, 3)
+        )
+        create_remap_table(camera=camera, out=out)
+        out.flush()
+        del out
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
 
 def main(args: argparse.Namespace):
     if args.bin is None:
@@ -103,9 +209,11 @@ def main(args: argparse.Namespace):
     input_path = Path(args.input).absolute()
     output_path = Path(args.output).absolute()
 
-    # determine how many images there should be:
-    gt_poses = np.genfromtxt(input_path / "ground_truth_imu_pose_00.csv", delimiter=",")
-    print(f"Dataset contains {len(gt_poses)} time-steps to process...")
+    # determine how many images there should be (one pose per line, no header). A
+    # plain line count avoids parsing every field the way np.genfromtxt would:
+    with open(input_path / "ground_truth_imu_pose_00.csv", "rb") as handle:
+        num_poses = sum(1 for _ in handle)
+    print(f"Dataset contains {num_poses} time-steps to process...")
 
     # load the config file
     with open(args.config, "rb") as handle:
@@ -118,35 +226,84 @@ def main(args: argparse.Namespace):
         )
         exit(1)
 
-    temp_dir = Path(tempfile.mkdtemp(prefix="cubemap_converter_"))
-
+    # Tables persist across runs, keyed by a content hash of the camera description.
+    # The typical dev loop iterates on the converter binary, not the intrinsics, so
+    # re-runs skip the table generation entirely.
+    cache_dir = Path.home() / ".cache" / "cubemap_converter"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # Build every unique remap table that is not already cached on disk.
+    unique_cameras: T.Dict[T.Tuple, T.Dict[str, T.Any]] = dict()
+    for description in cameras:
+        unique_cameras.setdefault(get_intrinsics_key(description), description)
+
+    # Paths of tables on disk, keyed by intrinsics. Duplicate cameras reuse the same
+    # `.raw` file.
+    table_paths: T.Dict[T.Tuple, Path] = {
+        key: cache_dir / f"{get_cache_key(description)}.raw"
+        for key, description in unique_cameras.items()
+    }
+
+    uncached: T.List[T.Dict[str, T.Any]] = []
+    for key, description in unique_cameras.items():
+        if table_paths[key].is_file():
+            print(f"Reusing cached remap table: {table_paths[key]}")
+        else:
+            uncached.append(description)
+
+    if unproject_fisheye_numba is not None:
+        # The numba kernel parallelizes internally via prange, and its default
+        # threading layer must only be entered from the main thread (see
+        # fisheye_numba.unproject_kernel) - generate serially.
+        for description in uncached:
+            write_remap_table(
+                camera=description, path=table_paths[get_intrinsics_key(description)]
+            )
+    else:
+        # NumPy releases the GIL, so tables for distinct intrinsics compute
+        # concurrently.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count()
+        ) as executor:
+            table_futures = [
+                executor.submit(
+                    write_remap_table,
+                    camera=description,
+                    path=table_paths[get_intrinsics_key(description)],
+                )
+                for description in uncached
+            ]
+            for future in table_futures:
+                future.result()
+
+    # Create a single command that converts every camera. The binary loops over the
+    # repeated camera options internally, re-using its GPU context and window rather
+    # than paying process + device startup once per camera:
+    command = [
+        str(args.bin),
+        "--input-path",
+        str(input_path),
+        "--output-path",
+        str(output_path),
+        "--num-images",
+        str(num_poses),
+    ]
     for index, description in enumerate(cameras):
-        remap_table = create_remap_table(camera=description)
-
-        # Write out the table somewhere
-        remap_table_path = temp_dir / f"camera_{index:02}.raw"
-        remap_table.astype(np.float32).tofile(remap_table_path)
-
-        # Create a command to convert
-        command = [
-            str(args.bin),
-            "--input-path",
-            str(input_path),
-            "--output-path",
-            str(output_path),
-            "--width",
-            str(remap_table.shape[1]),
-            "--height",
-            str(remap_table.shape[0]),
+        width, height = get_image_dimensions(description)
+        remap_table_path = table_paths[get_intrinsics_key(description)]
+        command += [
             "--camera-index",
             str(index),
-            "--num-images",
-            str(len(gt_poses)),
+            "--width",
+            str(width),
+            "--height",
+            str(height),
             "--remap-table",
             str(remap_table_path),
         ]
-        print(f"Running: {' '.join(command)}")
-        subprocess.check_call(command)
+
+    print(f"Running: {' '.join(command)}")
+    subprocess.check_call(command)
 
     # Copy CSV files and calibration file:
     for csv_path in input_path.glob("*.csv"):
@@ -4,6 +4,12 @@ import typing as T
 
 from utils import create_grid
 
+try:
+    import numexpr
+except ImportError:
+    # numexpr is optional; we fall back to plain numpy arithmetic.
+    numexpr = None
+
 
 def fisheye_distortion(
     theta: np.ndarray, coeffs: np.ndarray
@@ -14,34 +20,36 @@ def fisheye_distortion(
     ), f"theta should be n x 1, got: {theta.shape}"
     assert coeffs.shape == (4,), f"coeffs should be 4-elements, got: {coeffs.shape}"
 
-    poly_terms_even = np.concatenate(
-        [
-            np.ones_like(theta),
-            np.power(theta, 2),
-            np.power(theta, 4),
-            np.power(theta, 6),
-            np.power(theta, 8),
-        ],
-        axis=-1,
+    k1, k2, k3, k4 = coeffs
+
+    # Evaluate `r = theta * (1 + k1*theta^2 + k2*theta^4 + k3*theta^6 + k4*theta^8)`
+    # and its derivative wrt theta via Horner's scheme on theta^2. This avoids
+    # materializing (N, 5) matrices of powers of theta.
+    t2 = theta * theta
+    if numexpr is not None:
+        # numexpr fuses each expression into a single cache-blocked multithreaded
+        # pass, instead of one temporary array per arithmetic op. It promotes the
+        # literal constants to double, so cast back to preserve the input dtype:
+        local_dict = dict(theta=theta, t2=t2, k1=k1, k2=k2, k3=k3, k4=k4)
+        r = numexpr.evaluate(
+            "theta * (1.0 + t2 * (k1 + t2 * (k2 + t2 * (k3 + t2 * k4))))",
+            local_dict=local_dict,
+        ).astype(theta.dtype, copy=False)
+        r_D_theta = numexpr.evaluate(
+            "1.0 + t2 * (3.0 * k1 + t2 * (5.0 * k2 + t2 * (7.0 * k3 + t2 * (9.0 * k4))))",
+            local_dict=local_dict,
+        ).astype(theta.dtype, copy=False)
+        return r, r_D_theta
+
+    r = theta * (1.0 + t2 * (k1 + t2 * (k2 + t2 * (k3 + t2 * k4))))
+    r_D_theta = 1.0 + t2 * (
+        3.0 * k1 + t2 * (5.0 * k2 + t2 * (7.0 * k3 + t2 * (9.0 * k4)))
     )
-
-    # broadcast multiply over columns:
-    poly_terms_odd = poly_terms_even * theta
-
-    # Compute image plane radius:
-    coeffs_extended = np.concatenate([[1.0], coeffs])
-    r = poly_terms_odd @ coeffs_extended.reshape([5, 1])
-
-    # Compute derivative wrt theta:
-    r_D_theta = poly_terms_even @ (
-        coeffs_extended * np.array([1.0, 3.0, 5.0, 7.0, 9.0])
-    ).reshape([5, 1])
-
     return r, r_D_theta
 
 
 def fisheye_invert_distortion(
-    r: np.ndarray, coeffs: np.ndarray, max_iters: int = 10
+    r: np.ndarray, coeffs: np.ndarray, max_iters: int = 10, tolerance: float = 1.0e-9
 ) -> T.Tuple[np.ndarray, np.ndarray]:
     """Invert fisheye_distortion_poly with gauss newton solver."""
     assert max_iters > 0, f"max_iters = {max_iters}"
@@ -53,6 +61,10 @@ def fisheye_invert_distortion(
         r_predicted, r_D_theta = fisheye_distortion(theta=theta, coeffs=coeffs)
         error = r_predicted - r
         theta -= error / r_D_theta
+        # Newton converges quadratically on this smooth curve - most inputs are done
+        # well before `max_iters`.
+        if np.abs(error).max() < tolerance:
+            break
 
     return theta, error
 
@@ -141,30 +153,80 @@ def unproject_fisheye(
     ), f"p_native should be N x 2, got: {p_native.shape}"
     assert K.shape == (3, 3), f"K should be 3x3, got: {K.shape}"
 
-    # Convert pixel coordinates to the image plane:
-    p_native_homogenous = np.concatenate(
-        [p_native, np.ones_like(p_native[:, -1:])], axis=-1
-    )
-    p_img_homogenous = (np.linalg.inv(K) @ p_native_homogenous.transpose()).transpose()
+    # Convert pixel coordinates to the image plane. `K` is upper triangular with
+    # unit bottom row, so the inverse is just a shift and scale per axis:
+    fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+    x = (p_native[:, 0:1] - cx) * (1.0 / fx)
+    y = (p_native[:, 1:2] - cy) * (1.0 / fy)
 
-    # Compute radius and angle:
-    r = np.linalg.norm(p_img_homogenous[:, 0:2], axis=1, keepdims=True)
-    phi = np.arctan2(p_img_homogenous[:, 1:2], p_img_homogenous[:, 0:1])
+    # Compute image plane radius:
+    r = np.hypot(x, y)
 
-    # Undistort to compute theta via newton's method:
+    # Undistort to compute theta via newton's method. Stop as soon as every pixel has
+    # converged to well below the output precision, which typically takes 3-4 of the
+    # 10 allowed iterations:
+    tolerance = np.sqrt(np.finfo(r.dtype).eps)
     theta = np.copy(r)
     for _ in range(0, 10):
         r_predicted, r_D_theta = fisheye_distortion(theta=theta, coeffs=coeffs)
         error = r_predicted - r
         theta -= error / r_D_theta
+        if np.abs(error).max() < tolerance:
+            break
 
     # TODO: Check the error here.
-    # Compute unit vector
-    return np.concatenate(
-        [np.cos(phi) * np.sin(theta), np.sin(phi) * np.sin(theta), np.cos(theta)],
-        axis=-1,
+    # Compute unit vector. cos(phi) = x/r and sin(phi) = y/r, so we can skip the
+    # arctan2/cos/sin round-trip. Guard r == 0 (the principal point, where theta
+    # and sin(theta) are also zero).
+    s = np.sin(theta) / np.maximum(r, np.finfo(r.dtype).eps)
+    out = np.empty((p_native.shape[0], 3), dtype=theta.dtype)
+    out[:, 0:1] = x * s
+    out[:, 1:2] = y * s
+    out[:, 2:3] = np.cos(theta)
+    return out
+
+
+def unproject_fisheye_lut(
+    p_native: np.ndarray, K: np.ndarray, coeffs: np.ndarray, num_samples: int = 4096
+) -> np.ndarray:
+    """Inverse distortion model for fisheye, via a precomputed theta(r) lookup table.
+
+    The distortion curve is a smooth monotonic function of r alone, so rather than
+    running newton's method per pixel we invert it once on `num_samples` radii and
+    linearly interpolate every pixel into the result.
+    """
+    assert (
+        len(p_native.shape) == 2 and p_native.shape[-1] == 2
+    ), f"p_native should be N x 2, got: {p_native.shape}"
+    assert K.shape == (3, 3), f"K should be 3x3, got: {K.shape}"
+    assert coeffs.shape == (4,), f"coeffs should be 4-elements, got: {coeffs.shape}"
+
+    fx, fy, cx, cy = K[0, 0], K[1, 1], K[0, 2], K[1, 2]
+    x = (p_native[:, 0:1] - cx) * (1.0 / fx)
+    y = (p_native[:, 1:2] - cy) * (1.0 / fy)
+    r = np.hypot(x, y)
+
+    # Build the table in float64 (it is only `num_samples` long), spanning slightly
+    # past the largest radius in the image:
+    r_max = max(float(r.max()), 1.0e-6) * 1.05
+    r_grid = np.linspace(0.0, r_max, num_samples)
+    theta_grid, _ = fisheye_invert_distortion(
+        r_grid.reshape([-1, 1]), coeffs=coeffs.astype(np.float64)
+    )
+    theta = (
+        np.interp(r.ravel(), r_grid, theta_grid.ravel())
+        .reshape(r.shape)
+        .astype(r.dtype)
     )
 
+    # Compute unit vector (see unproject_fisheye):
+    s = np.sin(theta) / np.maximum(r, np.finfo(r.dtype).eps)
+    out = np.empty((p_native.shape[0], 3), dtype=theta.dtype)
+    out[:, 0:1] = x * s
+    out[:, 1:2] = y * s
+    out[:, 2:3] = np.cos(theta)
+    return out
+
 
 def test_fisheye_model():
     """Test that the forward and reverse fisheye model agree."""
@@ -192,3 +254,64 @@ def test_fisheye_model():
         p_cam = unproject_fisheye(p_native=pixel_coords, K=K, coeffs=coeffs)
         p_native = project_fisheye(p_cam=p_cam, K=K, coeffs=coeffs)
         np.testing.assert_allclose(p_native, pixel_coords, rtol=0.0, atol=1.0e-6)
+
+
+def test_fisheye_model_float32():
+    """Test that the float32 unprojection agrees with the float64 one.
+
+    The remap tables are computed and stored in float32, so the inversion need not
+    be more accurate than that.
+    """
+    coefficients, max_radius = get_fisheye_coefficients()
+
+    image_dims = np.array([320, 240])
+    principal_point = (image_dims - 1.0) / 2.0
+    pixel_coords = create_grid(*image_dims)
+
+    for coeffs, max_r in zip(coefficients, max_radius):
+        f = np.linalg.norm(image_dims) * 0.5 / max_r * 1.05
+        K = np.array(
+            [
+                [f, 0.0, principal_point[0]],
+                [0.0, f, principal_point[1]],
+                [0.0, 0.0, 1.0],
+            ]
+        )
+
+        p_cam = unproject_fisheye(p_native=pixel_coords, K=K, coeffs=coeffs)
+        p_cam_f32 = unproject_fisheye(
+            p_native=pixel_coords.astype(np.float32),
+            K=K.astype(np.float32),
+            coeffs=coeffs.astype(np.float32),
+        )
+        assert p_cam_f32.dtype == np.float32
+
+        # Round-trip pixel error should be well below the float32 output quantization:
+        p_native_f32 = project_fisheye(
+            p_cam=p_cam_f32.astype(np.float64), K=K, coeffs=coeffs
+        )
+        np.testing.assert_allclose(p_cam_f32, p_cam, rtol=0.0, atol=1.0e-5)
+        np.testing.assert_allclose(p_native_f32, pixel_coords, rtol=0.0, atol=1.0e-3)
+
+
+def test_fisheye_model_lut():
+    """Test that the LUT-based unprojection agrees with the newton one."""
+    coefficients, max_radius = get_fisheye_coefficients()
+
+    image_dims = np.array([320, 240])
+    principal_point = (image_dims - 1.0) / 2.0
+    pixel_coords = create_grid(*image_dims)
+
+    for coeffs, max_r in zip(coefficients, max_radius):
+        f = np.linalg.norm(image_dims) * 0.5 / max_r * 1.05
+        K = np.array(
+            [
+                [f, 0.0, principal_point[0]],
+                [0.0, f, principal_point[1]],
+                [0.0, 0.0, 1.0],
+            ]
+        )
+
+        p_cam = unproject_fisheye(p_native=pixel_coords, K=K, coeffs=coeffs)
+        p_cam_lut = unproject_fisheye_lut(p_native=pixel_coords, K=K, coeffs=coeffs)
+        np.testing.assert_allclose(p_cam_lut, p_cam, rtol=0.0, atol=1.0e-5)
@@ -1,9 +1,19 @@
 """Misc utility functions."""
+import functools
 import numpy as np
 
 
-def create_grid(width: int, height: int) -> np.ndarray:
-    """Return row-major grid of pixel coordinates."""
-    x, y = np.meshgrid(np.arange(0, width), np.arange(0, height))
-    p = np.stack([x, y], axis=-1)
-    return p.reshape([-1, 2])
+@functools.lru_cache(maxsize=16)
+def create_grid(width: int, height: int, dtype: np.dtype = np.float64) -> np.ndarray:
+    """Return row-major grid of pixel coordinates.
+
+    The result is cached (cameras frequently share dimensions) and marked read-only
+    so callers cannot corrupt the shared copy.
+    """
+    # Fill a preallocated (H*W, 2) buffer directly rather than going through
+    # meshgrid + stack + reshape, which allocates three intermediate arrays.
+    p = np.empty([height * width, 2], dtype=dtype)
+    p[:, 0] = np.tile(np.arange(0, width, dtype=dtype), height)
+    p[:, 1] = np.repeat(np.arange(0, height, dtype=dtype), width)
+    p.setflags(write=False)
+    return p
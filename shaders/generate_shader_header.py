@@ -14,15 +14,22 @@ def main(args: argparse.Namespace):
     with open(args.input) as handle:
         contents = handle.read()
 
-    output = str()
-    output += "// Machine generated file - do not modify.\n"
-    output += f"// Generated from: {filename}\n"
-    output += "#pragma once\n#include <string_view>\n\n"
-    output += "namespace shaders {\n"
-    output += f'constexpr std::string_view {shader_name} = R"(\n'
-    output += contents
-    output += '\n)";\n'
-    output += "}  // namespace shaders\n"
+    output = (
+        "// Machine generated file - do not modify.\n"
+        f"// Generated from: {filename}\n"
+        "#pragma once\n#include <string_view>\n\n"
+        "namespace shaders {\n"
+        f'constexpr std::string_view {shader_name} = R"(\n'
+        f'{contents}\n)";\n'
+        "}  // namespace shaders\n"
+    )
+
+    # Skip the write when nothing changed, so we don't trigger spurious recompiles of
+    # everything that includes the header:
+    if os.path.isfile(args.output):
+        with open(args.output) as handle:
+            if handle.read() == output:
+                return
 
     with open(args.output, "w") as handle:
         handle.write(output)
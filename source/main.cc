@@ -6,6 +6,7 @@
 #include <optional>
 #include <queue>
 #include <variant>
+#include <vector>
 
 #include <glad/gl.h>
 
@@ -27,17 +28,26 @@ static void glfw_error_callback(int error, const char* description) {
   fmt::print("GLFW error. Code = {}, Message = {}\n", error, description);
 }
 
-// Group together all the input arguments.
+// Group together all the input arguments. The camera-specific options may be repeated to
+// convert multiple cameras in a single invocation, re-using the GL context between them.
 struct ProgramArgs {
   std::string input_path;
   std::string output_path;
   std::size_t num_images;
+  std::vector<std::size_t> camera_indices;
+  std::vector<std::string> table_paths;
+  std::vector<int> table_widths;
+  std::vector<int> table_heights;
+  bool enable_gl_debug;
+  std::string valid_mask_path;
+};
+
+// The subset of arguments that describe a single camera.
+struct CameraArgs {
   std::size_t camera_index;
   std::string table_path;
   int table_width;
   int table_height;
-  bool enable_gl_debug;
-  std::string valid_mask_path;
 };
 
 // Parse program arts, or fail and return exit code.
@@ -48,10 +58,10 @@ std::variant<ProgramArgs, int> ParseProgramArgs(int argc, char** argv) {
     app.add_option("-i,--input-path", args.input_path, "Path to the input dataset.")->required();
     app.add_option("-o,--output-path", args.output_path, "Path to the output directory.");
     app.add_option("--num-images", args.num_images, "Num images in the dataset.")->required();
-    app.add_option("-c,--camera-index", args.camera_index, "Index of the camera to render.")->required();
-    app.add_option("-t,--remap-table", args.table_path, "Path to the remap table.")->required();
-    app.add_option("--width", args.table_width, "Width of the native image.")->required();
-    app.add_option("--height", args.table_height, "Height of the native image.")->required();
+    app.add_option("-c,--camera-index", args.camera_indices, "Indices of the cameras to render.")->required();
+    app.add_option("-t,--remap-table", args.table_paths, "Paths to the remap tables (one per camera).")->required();
+    app.add_option("--width", args.table_widths, "Widths of the native images (one per camera).")->required();
+    app.add_option("--height", args.table_heights, "Heights of the native images (one per camera).")->required();
     app.add_flag("--debug", args.enable_gl_debug, "Enable OpenGL debug log (v4.3 or higher).");
     app.add_option("--mask", args.valid_mask_path, "Optional valid mask image (png).");
     app.parse(argc, argv);
@@ -118,24 +128,24 @@ void CreateOrAssert(const std::filesystem::path& path) {
   ASSERT(created || !err, "Failed to create directory: `{}`. Error = {}", path.u8string(), err.message());
 }
 
-void ExecuteMainLoop(const ProgramArgs& args, GLFWwindow* const window) {
-  ASSERT(args.table_width > 0 && args.table_height > 0, "Dimensions must be positive: w={}, h={}", args.table_width,
-         args.table_height);
+void ExecuteMainLoop(const ProgramArgs& args, const CameraArgs& camera, GLFWwindow* const window) {
+  ASSERT(camera.table_width > 0 && camera.table_height > 0, "Dimensions must be positive: w={}, h={}",
+         camera.table_width, camera.table_height);
 
   // Path to the input directory:
   const std::filesystem::path dataset{args.input_path};
 
   // Create directories for the outputs:
   const std::filesystem::path output_root{args.output_path};
-  const std::filesystem::path output_dir_rgb = output_root / "image" / fmt::format("camera{:02}", args.camera_index);
+  const std::filesystem::path output_dir_rgb = output_root / "image" / fmt::format("camera{:02}", camera.camera_index);
   const std::filesystem::path output_dir_inv_range =
-      output_root / "range" / fmt::format("camera{:02}", args.camera_index);
+      output_root / "range" / fmt::format("camera{:02}", camera.camera_index);
   CreateOrAssert(output_dir_rgb);
   CreateOrAssert(output_dir_inv_range);
 
   // Load the remap table.
   const images::SimpleImage remap_table_img =
-      images::LoadRawFloatImage(args.table_path, args.table_width, args.table_height, 3);
+      images::LoadRawFloatImage(camera.table_path, camera.table_width, camera.table_height, 3);
 
   // Match window to the size of the target:
   glfwSetWindowSize(window, remap_table_img.width, remap_table_img.height);
@@ -144,7 +154,7 @@ void ExecuteMainLoop(const ProgramArgs& args, GLFWwindow* const window) {
   const gl_utils::Texture2D remap_table{remap_table_img};
 
   // Load the valid mask
-  const gl_utils::Texture2D valid_mask = LoadValidMask(args.valid_mask_path, args.table_width, args.table_height);
+  const gl_utils::Texture2D valid_mask = LoadValidMask(args.valid_mask_path, camera.table_width, camera.table_height);
 
   // Create a cube-map (initially empty)
   gl_utils::TextureArray rgb_cube{};
@@ -176,8 +186,8 @@ void ExecuteMainLoop(const ProgramArgs& args, GLFWwindow* const window) {
   const gl_utils::FullScreenQuad quad{};
 
   // Create a frame buffer to render into:
-  const int texture_width = args.table_width;
-  const int texture_height = args.table_height;
+  const int texture_width = camera.table_width;
+  const int texture_height = camera.table_height;
 
   // Cull clockwise back-faces
   glEnable(GL_CULL_FACE);
@@ -236,7 +246,7 @@ void ExecuteMainLoop(const ProgramArgs& args, GLFWwindow* const window) {
     // TODO: We'd get better GPU usage if this was a thread pool.
     std::vector<images::SimpleImage> faces;
     timer.Record(timing::SimpleTimer::Stages::Load,
-                 [&]() { faces = images::LoadCubemapImages(dataset, next_index, args.camera_index, true); });
+                 [&]() { faces = images::LoadCubemapImages(dataset, next_index, camera.camera_index, true); });
 
     // Copy the RGB + depth data:
     timer.Record(timing::SimpleTimer::Stages::Unpack, [&] {
@@ -340,6 +350,12 @@ void WindowSizeCallback(GLFWwindow* const window, int, int) {
 }
 
 int Run(const ProgramArgs& args) {
+  const std::size_t num_cameras = args.camera_indices.size();
+  ASSERT(args.table_paths.size() == num_cameras && args.table_widths.size() == num_cameras &&
+             args.table_heights.size() == num_cameras,
+         "Camera options must all be repeated once per camera. indices = {}, tables = {}, widths = {}, heights = {}",
+         num_cameras, args.table_paths.size(), args.table_widths.size(), args.table_heights.size());
+
   // Setup window
   glfwSetErrorCallback(glfw_error_callback);
   if (!glfwInit()) {
@@ -378,8 +394,11 @@ int Run(const ProgramArgs& args) {
     gl_utils::EnableDebugOutput(glad_version);
   }
 
-  // Render until the window closes:
-  ExecuteMainLoop(args, window);
+  // Render each camera in turn, re-using the window + GL context between them:
+  for (std::size_t i = 0; i < num_cameras && !glfwWindowShouldClose(window); ++i) {
+    const CameraArgs camera{args.camera_indices[i], args.table_paths[i], args.table_widths[i], args.table_heights[i]};
+    ExecuteMainLoop(args, camera, window);
+  }
 
   glfwDestroyWindow(window);
   glfwTerminate();